@@ -1,7 +1,251 @@
-from collections import OrderedDict
+import sys
+from collections import defaultdict
+
+# max_arguments of the arguments which take any number of parameters
+_UNBOUNDED = sys.maxsize
+# Number of parse_args calls served by ArgConstructor._interpret before the specialized version is generated. Compiling
+# costs about as much as a few hundred interpreted calls, so constructors used only a few times never pay for it
+_COMPILE_AFTER_CALLS = 256
+# Maximum number of argument strings remembered by each ArgConstructor
+_PARSE_CACHE_SIZE = 256
+# Longer lists and tuples aren't cached: their keys cost about as much to build as the string, and would keep a lot of
+# memory alive
+_CACHEABLE_LENGTH = 16
+# Values of these types (and lists or tuples of them) always render the same way, so they're safe to cache on
+_CACHEABLE_TYPES = (str, int, float, bool)
+
+
+def _stringify(value):
+    """Convert an argument's parameter to str, turning None into an empty string"""
+    return str(value) if value is not None else ''
+
+
+def _intern_str(value):
+    """Convert value to str and intern it, so it's compared by identity in dict and set lookups"""
+    return sys.intern(str(value))
+
+
+def _convert_to_iterable(arg, cast_func=None):
+    """Converts any object to an iterable
+
+    :param arg: any object to convert to iterable
+    :param cast_func: function to apply to each element of the iterable. None to keep the elements as is
+    :type cast_func: callable
+    :return:
+        - list with one element if arg is not iterable or is a string;
+        - empty list if arg is None;
+        - list of with the same elements as arg has is arg is itself an iterable. If arg is a list and there's
+          no cast_func, arg itself is returned without copying
+    :rtype: list
+    """
+    arg_type = type(arg)
+    if arg is None:
+        return []
+    elif arg_type is list:
+        return arg if cast_func is None else [cast_func(x) for x in arg]
+    elif arg_type is tuple:
+        return list(arg) if cast_func is None else [cast_func(x) for x in arg]
+    elif isinstance(arg, str):
+        # Strings are iterable, but they are a single value
+        return [arg if cast_func is None else cast_func(arg)]
+
+    try:
+        iterator = iter(arg)
+    except TypeError:
+        return [arg if cast_func is None else cast_func(arg)]
+    return list(iterator) if cast_func is None else [cast_func(x) for x in iterator]
+
+
+def _check_against_choices(name, values, choices, choices_lookup):
+    """Raise an error if any of the parameters does not match one of the choises
+
+    :param name: name of an argument. Used only to raise meaningful exceptions
+    :type name: str
+    :param values: values supplied to the argument in parse_args
+    :type values: list
+    :param choices: values which are allowed for an argument to take, as supplied to add_argument
+    :param choices_lookup: the same values as in choices, but in a frozenset if all of them are hashable
+    :type choices_lookup: frozenset|list
+    """
+    for value in values:
+        try:
+            allowed = value in choices_lookup
+        except TypeError:
+            # Unhashable value can still be equal to one of the choices
+            allowed = value in choices
+        if not allowed:
+            raise ValueError("Parameter %s must be one of the %s, got %s instead" % (name, choices, value))
+
+
+def _parse_arg(name, parameters, value):
+    """Construct part of the argument string for one argument
+
+    :param name: name of an argument. Used only to raise meaningful exceptions
+    :type name: str
+    :param parameters: argument's properties
+    :type parameters: _ArgSpec
+    :param value: value supplied to the argument in parse_args or its default. Must not be None
+    :return: part of the argument string for this particular argument
+    :rtype: str
+    """
+    if parameters.flag_only:
+        return parameters.flag
+
+    value = _convert_to_iterable(value)
+    flag = parameters.flag
+    min_arguments = parameters.min_arguments
+    max_arguments = parameters.max_arguments
+    num_values = len(value)
+
+    if num_values < min_arguments or num_values > max_arguments:
+        if min_arguments == max_arguments:
+            error_message = "Parameter '%s' takes exactly %d argument(s), got %d instead" % (
+                name,
+                min_arguments,
+                num_values
+            )
+        else:
+            error_message = "Parameter '%s' takes from %d to %s arguments, got %d instead" % (
+                name,
+                min_arguments,
+                max_arguments if max_arguments != _UNBOUNDED else "infinite number of",
+                num_values
+            )
+        raise ValueError(error_message)
+
+    if parameters.choices is not None:
+        _check_against_choices(name, value, parameters.choices, parameters.choices_lookup)
+
+    if num_values == 1:
+        # Most of the arguments take exactly one parameter, so don't bother joining it
+        return flag + parameters.flag_separator + _stringify(value[0])
+
+    # Most of the time there are no Nones among the values, so str can be mapped directly without a Python-level call.
+    # Nones are looked up by identity, 'None in value' would call __eq__ of the values which may raise or be ambiguous
+    has_none = any(x is None for x in value)
+    return flag + parameters.flag_separator + parameters.args_separator.join(
+        map(_stringify if has_none else str, value)
+    )
+
+
+def _freeze_scalar(value):
+    """Build a hashable token which is equal for two scalars only if they render the same way
+
+    :return: the token or None if the value can't be cached reliably
+    :rtype: tuple
+    """
+    value_type = type(value)
+    if value_type is float:
+        # 0.0 == -0.0, but they render differently, so floats are compared by their representation
+        return value_type, repr(value)
+    elif value_type in _CACHEABLE_TYPES or value is None:
+        # Keep the types, so 1 and True don't share the same token
+        return value_type, value
+    return None
+
+
+def _freeze(value):
+    """Build a hashable token which is equal for two values only if they render the same way
+
+    :param value: value supplied to an argument. Lists and tuples of scalars are supported as well as plain scalars
+    :return: the token or None if the value can't or shouldn't be cached
+    :rtype: tuple
+    """
+    value_type = type(value)
+    if value_type is list or value_type is tuple:
+        if len(value) > _CACHEABLE_LENGTH:
+            return None
+        tokens = []
+        for item in value:
+            token = _freeze_scalar(item)
+            if token is None:
+                return None
+            tokens.append(token)
+        return tuple(tokens)
+    return _freeze_scalar(value)
+
+
+def _cache_key(kwargs):
+    """Build a hashable key identifying the result of parse_args for given kwargs
+
+    :param kwargs: values supplied to parse_args
+    :type kwargs: dict
+    :return: key for the parse cache or None if some of the values can't or shouldn't be cached
+    :rtype: frozenset
+    """
+    items = []
+    for name, value in kwargs.items():
+        if value is None:
+            continue
+        token = _freeze(value)
+        if token is None:
+            return None
+        items.append((name, token))
+    return frozenset(items)
+
+
+class _ArgSpec(object):
+    """Properties of a single argument added to an ArgConstructor"""
+    __slots__ = ('flag',
+                 'mandatory',
+                 'default',
+                 'min_arguments',
+                 'max_arguments',
+                 'flag_separator',
+                 'choices',
+                 'choices_lookup',
+                 'requires',
+                 'required_by',
+                 'conflicts_with',
+                 'args_separator',
+                 'flag_only',
+                 'default_output')
+
+    def __init__(self, flag, mandatory, default, min_arguments, max_arguments, flag_separator, choices, requires,
+                 required_by, conflicts_with, args_separator):
+        self.flag = flag
+        self.mandatory = mandatory
+        self.default = default
+        self.min_arguments = min_arguments
+        self.max_arguments = max_arguments
+        self.flag_separator = flag_separator
+        self.choices = choices
+        # Membership is checked for every supplied value, so keep a hashed copy of the choices as well
+        try:
+            self.choices_lookup = frozenset(choices) if choices is not None else None
+        except TypeError:
+            self.choices_lookup = choices
+        self.requires = requires
+        self.required_by = required_by
+        self.conflicts_with = conflicts_with
+        self.args_separator = args_separator
+        # Arguments without parameters always render as the bare flag
+        self.flag_only = min_arguments == max_arguments == 0
+        # Rendered default, filled in by ArgConstructor.add_argument for defaults which always render the same way
+        self.default_output = None
+
+    def __getstate__(self):
+        """Get the state for pickle and copy, slotted objects have no __dict__ for pickle protocols 0 and 1 to use"""
+        return {x: getattr(self, x) for x in self.__slots__}
+
+    def __setstate__(self, state):
+        for x, y in state.items():
+            setattr(self, x, y)
 
 
 class ArgConstructor(object):
+    __slots__ = ('_parameters_separator',
+                 '_arguments_list',
+                 '_strict',
+                 '_deps_cache',
+                 '_conflicts_cache',
+                 '_has_dependencies',
+                 '_has_conflicts',
+                 '_compiled',
+                 '_uncompiled_calls',
+                 '_parse_cache',
+                 '__weakref__')
+
     def __init__(self, parameters_separator=' ', strict=True):
         """Initialize an ArgConstructor object
 
@@ -12,8 +256,27 @@ class ArgConstructor(object):
         :type strict: bool
         """
         self._parameters_separator = str(parameters_separator)
-        self._arguments_list = OrderedDict()
+        self._arguments_list = {}
         self._strict = bool(strict)
+        self._deps_cache = None
+        self._conflicts_cache = None
+        # Most constructors have no dependencies or conflicts at all, and then parse_args doesn't check them
+        self._has_dependencies = False
+        self._has_conflicts = False
+        self._compiled = None
+        self._uncompiled_calls = 0
+        self._parse_cache = {}
+
+    def __getstate__(self):
+        """Get the state for pickle and copy, leaving out the generated parse_args, which can't be pickled"""
+        state = {x: getattr(self, x) for x in self.__slots__ if x != '__weakref__'}
+        state['_compiled'] = None
+        state['_uncompiled_calls'] = 0
+        return state
+
+    def __setstate__(self, state):
+        for x, y in state.items():
+            setattr(self, x, y)
 
     def add_argument(self, name, flag,
                      mandatory=False,
@@ -27,7 +290,8 @@ class ArgConstructor(object):
                      args_separator=' '):
         """Add an argument to the constructor
 
-        :param name: name of the argument. Must be unique constructor-wide
+        :param name: name of the argument. Must be unique constructor-wide. Names are interned, so looking them up by
+            keyword arguments (which are interned by the compiler) boils down to a pointer comparison
         :type name: str
         :param flag: string to be used as a flag for this argument
         :type flag: str
@@ -41,42 +305,73 @@ class ArgConstructor(object):
         :param choices: if supplied - the allowed values for the argument is restricted to it
         :param requires: one or more arguments this argument depends on
         :param required_by: one or more arguments this argument is depended by
-        :param conflicts_with: one or more arguments this argument must not be supplied together with
+        :param conflicts_with: one or more arguments this argument must not be supplied together with. Conflicts are
+            symmetric: parse_args raises if either side is supplied while the other one is supplied, mandatory or
+            required by a supplied argument, no matter which of them declared the conflict. Mandatory arguments count
+            even if they would be rendered from their defaults. The error names the first conflicting supplied argument
         :param args_separator: string to put between parameters of the argument
         """
+        name = _intern_str(name)
+
         # Check if we already have that parameter
         if name in self._arguments_list:
             raise ValueError("parameter %s already exists" % name)
 
         # Basic parameters checks and type casts
-        flag = str(flag)
+        flag = _intern_str(flag)
         mandatory = bool(mandatory)
-        flag_separator = str(flag_separator)
-        args_separator = str(args_separator)
-        requires = self._convert_to_iterable(requires, str)
-        required_by = self._convert_to_iterable(required_by, str)
-        conflicts_with = self._convert_to_iterable(conflicts_with, str)
+        flag_separator = _intern_str(flag_separator)
+        args_separator = _intern_str(args_separator)
+        requires = _convert_to_iterable(requires, _intern_str)
+        required_by = _convert_to_iterable(required_by, _intern_str)
+        conflicts_with = _convert_to_iterable(conflicts_with, _intern_str)
         min_arguments, max_arguments = self._unpack_num_arguments(arguments)
 
         # Advanced argument checks
-        if choices is not None and (not hasattr(choices, '__iter__') or len(choices) == 0):
-            raise ValueError("choices must be a non-zero long iterable")
-
-        params = {}
-        for param in ('flag',
-                      'mandatory',
-                      'default',
-                      'min_arguments',
-                      'max_arguments',
-                      'flag_separator',
-                      'choices',
-                      'requires',
-                      'required_by',
-                      'conflicts_with',
-                      'args_separator'):
-            params[param] = locals()[param]
-
-        self._arguments_list[name] = params
+        if choices is not None:
+            try:
+                iterator = iter(choices)
+            except TypeError:
+                raise ValueError("choices must be an iterable")
+            if iterator is choices:
+                # Generators and other iterators are exhausted by the first check, so materialize them. Other choices
+                # are kept as they are, so error messages show them the way they were supplied
+                choices = list(iterator)
+            if not choices:
+                raise ValueError("choices must be a non-empty iterable")
+
+        parameters = _ArgSpec(flag,
+                              mandatory,
+                              default,
+                              min_arguments,
+                              max_arguments,
+                              flag_separator,
+                              choices,
+                              requires,
+                              required_by,
+                              conflicts_with,
+                              args_separator)
+        # Only defaults which always render the same way (immutable scalars and tuples of them) are rendered in advance,
+        # others, including lists which may be changed after the argument is added, are rendered every time they're used
+        static_default = default is None or (type(default) is not list and _freeze(default) is not None)
+        if default is not None and static_default:
+            try:
+                parameters.default_output = _parse_arg(name, parameters, default)
+            except ValueError:
+                # Invalid default is reported by parse_args, and only if it's actually used
+                pass
+        self._arguments_list[name] = parameters
+        self._has_dependencies = self._has_dependencies or bool(requires or required_by)
+        self._has_conflicts = self._has_conflicts or bool(conflicts_with)
+
+        # Dependency graphs, the renderer and the rendered strings have to be rebuilt to take the new argument into
+        # account
+        self._deps_cache = None
+        self._conflicts_cache = None
+        self._compiled = None
+        self._uncompiled_calls = 0
+        # Strings rendered with a default which may change can't be cached at all, since kwargs don't identify them
+        self._parse_cache = {} if self._parse_cache is not None and static_default else None
 
     @staticmethod
     def _unpack_num_arguments(arguments):
@@ -91,153 +386,213 @@ class ArgConstructor(object):
 
         if min_arguments is None or min_arguments < 0:
             min_arguments = 0
-        if max_arguments is None:
-            max_arguments = float('inf')
+        if max_arguments is None or max_arguments == float('inf'):
+            max_arguments = _UNBOUNDED
         if min_arguments > max_arguments:
             raise ValueError("Lower value from 'arguments' must be greater or equal than higher one")
 
         return min_arguments, max_arguments
 
-    @staticmethod
-    def _check_against_choices(name, value, choices):
-        """Raise an error if parameter does not match one of the choises
-
-        :param name: name of an argument. Used only to raise meaningful exceptions
-        :type name: str
-        :param value: value supplied to the argument in parse_args
-        :param choices: values which are allowed for an argument to take. None if no restrictions are applied
-        """
-        if choices is not None and value not in choices:
-            raise ValueError("Parameter %s must be one of the %s, got %s instead" % (name, choices, value))
+    def _build_deps(self):
+        """Build a mapping of every argument to the arguments it depends on"""
+        dependants = defaultdict(set)
+        for argument, parameters in self._arguments_list.items():
+            dependants[argument].update(parameters.requires)
+            for parameter in parameters.required_by:
+                dependants[parameter].add(argument)
+        self._deps_cache = {x: frozenset(y) for x, y in dependants.items()}
 
-    @classmethod
-    def _parse_arg(cls, name, parameters, value):
-        """Construct part of the argument string for one argument
+    def _build_conflicts(self):
+        """Build a mapping of every argument to the arguments it conflicts with
 
-        :param name: name of an argument. Used only to raise meaningful exceptions
-        :type name: str
-        :param parameters: dict with argument's properties
-        :type parameters: dict
-        :param value: value supplied to the argument in parse_args
-        :return: part of the argument string for this particular argument
-        :rtype: str
+        Conflicts are symmetric: if 'a' conflicts with 'b', 'b' conflicts with 'a' as well, even if only one of them
+        has it in conflicts_with.
         """
-        if value is None:
-            if parameters['mandatory']:
-                if parameters['default'] is not None:
-                    # Supply default if possible
-                    value = parameters['default']
-                else:
-                    raise ValueError("Parameter '%s' is mandatory but not supplied" % name)
-            else:
-                # Else make no difference
-                return None
-
-        value = cls._convert_to_iterable(value)
-
-        if parameters['min_arguments'] == parameters['max_arguments'] == 0:
-            return parameters['flag']
-        elif len(value) < parameters['min_arguments'] or len(value) > parameters['max_arguments']:
-            if parameters['min_arguments'] == parameters['max_arguments']:
-                error_message = "Parameter '%s' takes exactly %d argument(s), got %d instead" % (
-                    name,
-                    parameters['min_arguments'],
-                    len(value)
-                )
-            else:
-                error_message = "Parameter '%s' takes from %d to %s arguments, got %d instead" % (
-                    name,
-                    parameters['min_arguments'],
-                    parameters['max_arguments'] if parameters['max_arguments'] != float('inf') else "infinite number of",
-                    len(value)
-                )
-            raise ValueError(error_message)
-
-        for arg in value:
-            # Check if all the values are from choices, if supplied
-            cls._check_against_choices(name, arg, parameters['choices'])
-
-        return parameters['flag_separator'].join((
-                parameters['flag'],
-                parameters['args_separator'].join([str(i) if i is not None else '' for i in value])
-        ))
+        conflicts = defaultdict(set)
+        for argument, parameters in self._arguments_list.items():
+            conflicts[argument].update(parameters.conflicts_with)
+            for conflict in parameters.conflicts_with:
+                conflicts[conflict].add(argument)
+        self._conflicts_cache = {x: frozenset(y) for x, y in conflicts.items()}
 
-    @staticmethod
-    def _append_if_not_none(container, element):
-        """Append element to a container if element is not None"""
-        if element is not None:
-            container.append(element)
+    def _check_dependencies(self, kwargs):
+        """Check if all dependencies are met
 
-    @staticmethod
-    def _convert_to_iterable(arg, cast_func=lambda x: x):
-        """Converts any object to an iterable
-
-        :param arg: any object to convert to iterable
-        :param cast_func: function to apply to each element of the iterable
-        :type cast_func: callable
-        :return:
-            - list with one element if arg is not iterable;
-            - empty list if arg is None;
-            - list of with the same elements as arg has is arg is itself an iterable
-        :rtype: list
+        :return: names of the arguments which are required by the supplied ones and so must be in the arguments string
+        :rtype: set
         """
-        if arg is None:
-            return []
-        elif not hasattr(arg, '__iter__'):
-            return [cast_func(arg)]
-        else:
-            return [cast_func(x) for x in arg]
-
-    def _check_dependencies(self, kwargs):
-        """Check if all dependencies are met"""
-        dependants = {}
-        for argument in self._arguments_list:
-            if argument not in dependants:
-                dependants[argument] = set()
-            dependants[argument].update(self._arguments_list[argument]['requires'])
-            for parameter in self._arguments_list[argument]['required_by']:
-                if parameter not in dependants:
-                    dependants[parameter] = set()
-                dependants[parameter].add(argument)
+        if self._deps_cache is None:
+            self._build_deps()
+        deps_cache = self._deps_cache
+        arguments_list = self._arguments_list
+        effectively_mandatory = set()
+        add = effectively_mandatory.add
         for argument in kwargs:
-            for dep in dependants[argument]:
-                if dep not in kwargs and self._arguments_list[dep]['default'] is None:
+            for dep in deps_cache[argument]:
+                if dep not in kwargs and arguments_list[dep].default is None:
                     raise ValueError("Parameter '%s' requires '%s', but it's not supplied" % (argument, dep))
                 else:
-                    self._arguments_list[dep]['mandatory'] = True
+                    add(dep)
+        return effectively_mandatory
+
+    def _check_for_conflicts(self, kwargs, effectively_mandatory):
+        """Check if there's no conflicts in supplied arguments
 
-    def _check_for_conflicts(self, kwargs):
-        """Check if there's no conflicts in supplied arguments"""
+        :param effectively_mandatory: names of the arguments made mandatory by dependencies, see _check_dependencies
+        :type effectively_mandatory: set
+        """
+        if self._conflicts_cache is None:
+            self._build_conflicts()
+        conflicts_cache = self._conflicts_cache
+        arguments_list = self._arguments_list
+        present = kwargs.keys() | effectively_mandatory
         for argument in kwargs:
-            for conflict in self._arguments_list[argument]['conflicts_with']:
-                if self._arguments_list[conflict]['mandatory'] or conflict in kwargs:
-                    raise ValueError("Argument %s conflicts with %s" % (argument, conflict))
+            conflicts = conflicts_cache[argument]
+            if not conflicts:
+                continue
+            clashes = conflicts & present or [x for x in conflicts if arguments_list[x].mandatory]
+            if clashes:
+                raise ValueError("Argument %s conflicts with %s" % (argument, ', '.join(sorted(clashes))))
 
-    def parse_args(self, **kwargs):
-        """Construct an arguments string using given values
+    def _interpret(self, kwargs):
+        """Construct an arguments string the same way the code generated by _compile does, walking the arguments list
 
-        :param kwargs: every positional argument should be a value for previously added arguments
+        :param kwargs: values supplied to parse_args
         :type kwargs: dict
         :return: arguments string
         :rtype: str
         """
-        kwargs = {x: y for x, y in kwargs.items() if y is not None}  # Eliminate kwargs which have 'None' value
+        arguments_list = self._arguments_list
+        supplied = {}
+        for x, y in kwargs.items():
+            if y is not None:
+                if x in arguments_list:
+                    supplied[x] = y
+                elif self._strict:
+                    raise KeyError("Argument %s not found" % x)
+        kwargs = supplied
+
+        effectively_mandatory = self._check_dependencies(kwargs) if self._has_dependencies else frozenset()
+        if self._has_conflicts:
+            self._check_for_conflicts(kwargs, effectively_mandatory)
+
+        result_list = []
+        for argument, parameters in arguments_list.items():
+            value = kwargs.get(argument)
+            if value is None:
+                if not parameters.mandatory and argument not in effectively_mandatory:
+                    continue
+                elif parameters.default_output is not None:
+                    result_list.append(parameters.default_output)
+                    continue
+                elif parameters.default is None:
+                    raise ValueError("Parameter '%s' is mandatory but not supplied" % argument)
+                value = parameters.default
+            result_list.append(_parse_arg(argument, parameters, value))
+        return self._parameters_separator.join(result_list)
+
+    def _compile(self):
+        """Generate a parse_args implementation specialized for the current set of arguments
+
+        Generating and compiling the code costs as much as a few hundred interpreted calls, so parse_args only does it
+        after _COMPILE_AFTER_CALLS calls, see _interpret. The surplus arguments check is specialized on _strict, and
+        every argument gets its own straight-line snippet with the flag inlined, so the arguments list isn't walked and
+        the argument properties aren't re-read on every parse_args call. Dependency and conflict checks are delegated to
+        the methods using the cached graphs, and left out altogether if no argument has dependencies or conflicts.
+        """
+        # Arguments which may become mandatory because some other argument requires them
+        dependencies = frozenset()
+        if self._has_dependencies:
+            if self._deps_cache is None:
+                self._build_deps()
+            dependencies = dependencies.union(*self._deps_cache.values())
 
-        # If we have surplus arguments raise or delete them depending on _strict
-        for arg in [x for x in kwargs if x not in self._arguments_list]:
-            if self._strict:
-                raise KeyError("Argument %s not found" % arg)
+        # The generated function takes the constructor as an argument instead of closing over it, so copies don't call
+        # the methods of the original
+        namespace = {'_parse_arg': _parse_arg,
+                     'no_dependencies': frozenset()}
+        # Eliminate kwargs which have 'None' value and surplus arguments in a single pass
+        source = ['def _parse_args(self, kwargs):',
+                  '    arguments_list = self._arguments_list']
+        if self._strict:
+            source.extend(['    supplied = {}',
+                           '    for x, y in kwargs.items():',
+                           '        if y is not None:',
+                           '            if x not in arguments_list:',
+                           '                raise KeyError("Argument %s not found" % x)',
+                           '            supplied[x] = y',
+                           '    kwargs = supplied'])
+        else:
+            source.append('    kwargs = {x: y for x, y in kwargs.items() if y is not None and x in arguments_list}')
+        if self._has_dependencies:
+            source.append('    effectively_mandatory = self._check_dependencies(kwargs)')
+        if self._has_conflicts:
+            source.append('    self._check_for_conflicts(kwargs, %s)' % (
+                'effectively_mandatory' if self._has_dependencies else 'no_dependencies'
+            ))
+        source.extend(['    get = kwargs.get',
+                       '    result_list = []',
+                       '    append = result_list.append'])
+        for index, (argument, parameters) in enumerate(self._arguments_list.items()):
+            spec = '_spec%d' % index
+            namespace[spec] = parameters
+            source.append('    value = get(%r)' % argument)
+            source.append('    if value is not None:')
+            if parameters.flag_only:
+                source.append('        append(%r)' % parameters.flag)
             else:
-                del kwargs[arg]
+                source.append('        append(_parse_arg(%r, %s, value))' % (argument, spec))
+            if parameters.mandatory:
+                source.append('    else:')
+            elif parameters.default is not None and argument in dependencies:
+                # Required arguments without a default never get here, check_dependencies raises for them
+                source.append('    elif %r in effectively_mandatory:' % argument)
+            else:
+                continue
+            if parameters.default_output is not None:
+                source.append('        append(%r)' % parameters.default_output)
+            elif parameters.default is not None:
+                source.append('        append(_parse_arg(%r, %s, %s.default))' % (argument, spec, spec))
+            else:
+                error_message = "Parameter '%s' is mandatory but not supplied" % argument
+                source.append('        raise ValueError(%r)' % error_message)
+        source.append('    return %r.join(result_list)' % self._parameters_separator)
 
-        self._check_dependencies(kwargs)
-        self._check_for_conflicts(kwargs)
+        exec('\n'.join(source), namespace)
+        self._compiled = namespace['_parse_args']
 
-        result_list = []
-        for argument in self._arguments_list:
-            self._append_if_not_none(
-                result_list,
-                self._parse_arg(argument, self._arguments_list[argument], kwargs.get(argument))
-            )
+    def parse_args(self, **kwargs):
+        """Construct an arguments string using given values
 
-        return self._parameters_separator.join(result_list)
+        :param kwargs: every positional argument should be a value for previously added arguments
+        :type kwargs: dict
+        :return: arguments string
+        :rtype: str
+        """
+        cache_key = _cache_key(kwargs) if self._parse_cache is not None else None
+        if cache_key is not None:
+            # Another thread may evict the entry between a membership test and a lookup, so do both at once
+            result = self._parse_cache.pop(cache_key, None)
+            if result is not None:
+                # Reinsert the entry to move it to the end, so the least recently used one is evicted first
+                self._parse_cache[cache_key] = result
+                return result
+
+        if self._compiled is not None:
+            result = self._compiled(self, kwargs)
+        elif self._uncompiled_calls < _COMPILE_AFTER_CALLS:
+            self._uncompiled_calls += 1
+            result = self._interpret(kwargs)
+        else:
+            self._compile()
+            result = self._compiled(self, kwargs)
+        if cache_key is not None:
+            if len(self._parse_cache) >= _PARSE_CACHE_SIZE:
+                try:
+                    # Evict the least recently used entry. Other threads may be evicting or adding entries as well, so
+                    # the entry may be gone already or the iteration may fail, and then it's fine to leave it to them
+                    self._parse_cache.pop(next(iter(self._parse_cache)), None)
+                except (StopIteration, RuntimeError):
+                    pass
+            self._parse_cache[cache_key] = result
+        return result